@@ -3,12 +3,16 @@ Instagram Followers Analyzer
 Aplicación Streamlit profesional para analizar seguidores de Instagram
 """
 
+import html
+import re
 import streamlit as st
-import json
+import orjson
 import pandas as pd
+import xlsxwriter
 from io import BytesIO
-from typing import Set, List, Dict, Any, Optional
-from dataclasses import dataclass
+from operator import attrgetter
+from typing import Set, FrozenSet, List, Dict, Any, Optional
+from dataclasses import dataclass, field
 from datetime import datetime
 import plotly.graph_objects as go
 from streamlit_lottie import st_lottie
@@ -18,8 +22,8 @@ import requests
 # CONFIGURACIÓN DE PÁGINA
 # =============================================================================
 
-# Instagram SVG icon (base64 encoded for favicon)
-INSTAGRAM_ICON = "data:image/svg+xml,<svg xmlns='http://www.w3.org/2000/svg' viewBox='0 0 448 512'><defs><linearGradient id='ig' x1='0%25' y1='100%25' x2='100%25' y2='0%25'><stop offset='0%25' style='stop-color:%23FFDC80'/><stop offset='25%25' style='stop-color:%23FCAF45'/><stop offset='50%25' style='stop-color:%23F77737'/><stop offset='75%25' style='stop-color:%23F56040'/><stop offset='100%25' style='stop-color:%23C13584'/></linearGradient></defs><path fill='url(%23ig)' d='M224.1 141c-63.6 0-114.9 51.3-114.9 114.9s51.3 114.9 114.9 114.9S339 319.5 339 255.9 287.7 141 224.1 141zm0 189.6c-41.1 0-74.7-33.5-74.7-74.7s33.5-74.7 74.7-74.7 74.7 33.5 74.7 74.7-33.6 74.7-74.7 74.7zm146.4-194.3c0 14.9-12 26.8-26.8 26.8-14.9 0-26.8-12-26.8-26.8s12-26.8 26.8-26.8 26.8 12 26.8 26.8zm76.1 27.2c-1.7-35.9-9.9-67.7-36.2-93.9-26.2-26.2-58-34.4-93.9-36.2-37-2.1-147.9-2.1-184.9 0-35.8 1.7-67.6 9.9-93.9 36.1s-34.4 58-36.2 93.9c-2.1 37-2.1 147.9 0 184.9 1.7 35.9 9.9 67.7 36.2 93.9s58 34.4 93.9 36.2c37 2.1 147.9 2.1 184.9 0 35.9-1.7 67.7-9.9 93.9-36.2 26.2-26.2 34.4-58 36.2-93.9 2.1-37 2.1-147.8 0-184.8zM398.8 388c-7.8 19.6-22.9 34.7-42.6 42.6-29.5 11.7-99.5 9-132.1 9s-102.7 2.6-132.1-9c-19.6-7.8-34.7-22.9-42.6-42.6-11.7-29.5-9-99.5-9-132.1s-2.6-102.7 9-132.1c7.8-19.6 22.9-34.7 42.6-42.6 29.5-11.7 99.5-9 132.1-9s102.7-2.6 132.1 9c19.6 7.8 34.7 22.9 42.6 42.6 11.7 29.5 9 99.5 9 132.1s2.7 102.7-9 132.1z'/></svg>"
+# Instagram SVG icon (minified, percent-encoded data URI for favicon)
+INSTAGRAM_ICON = "data:image/svg+xml,<svg xmlns='http://www.w3.org/2000/svg' viewBox='0 0 448 512'><linearGradient id='ig' x1='0' y1='1' x2='1' y2='0'><stop stop-color='%23FFDC80'/><stop offset='.25' stop-color='%23FCAF45'/><stop offset='.5' stop-color='%23F77737'/><stop offset='.75' stop-color='%23F56040'/><stop offset='1' stop-color='%23C13584'/></linearGradient><path fill='url(%23ig)' d='M224.1 141c-63.6 0-114.9 51.3-114.9 114.9s51.3 114.9 114.9 114.9S339 319.5 339 255.9 287.7 141 224.1 141zm0 189.6c-41.1 0-74.7-33.5-74.7-74.7s33.5-74.7 74.7-74.7 74.7 33.5 74.7 74.7-33.6 74.7-74.7 74.7zm146.4-194.3c0 14.9-12 26.8-26.8 26.8-14.9 0-26.8-12-26.8-26.8s12-26.8 26.8-26.8 26.8 12 26.8 26.8zm76.1 27.2c-1.7-35.9-9.9-67.7-36.2-93.9-26.2-26.2-58-34.4-93.9-36.2-37-2.1-147.9-2.1-184.9 0-35.8 1.7-67.6 9.9-93.9 36.1s-34.4 58-36.2 93.9c-2.1 37-2.1 147.9 0 184.9 1.7 35.9 9.9 67.7 36.2 93.9s58 34.4 93.9 36.2c37 2.1 147.9 2.1 184.9 0 35.9-1.7 67.7-9.9 93.9-36.2 26.2-26.2 34.4-58 36.2-93.9 2.1-37 2.1-147.8 0-184.8zM398.8 388c-7.8 19.6-22.9 34.7-42.6 42.6-29.5 11.7-99.5 9-132.1 9s-102.7 2.6-132.1-9c-19.6-7.8-34.7-22.9-42.6-42.6-11.7-29.5-9-99.5-9-132.1s-2.6-102.7 9-132.1c7.8-19.6 22.9-34.7 42.6-42.6 29.5-11.7 99.5-9 132.1-9s102.7-2.6 132.1 9c19.6 7.8 34.7 22.9 42.6 42.6 11.7 29.5 9 99.5 9 132.1s2.7 102.7-9 132.1z'/></svg>"
 
 st.set_page_config(
     page_title="Instagram Followers Analyzer",
@@ -32,14 +36,22 @@ st.set_page_config(
 # ENTIDAD DE DOMINIO
 # =============================================================================
 
-@dataclass(frozen=True)
+PROFILE_URL_PREFIX = "https://www.instagram.com/"
+
+
+@dataclass(frozen=True, slots=True)
 class InstagramUser:
     """Representa un usuario de Instagram"""
     username: str
+    username_lower: str = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        # Se calcula una sola vez: __hash__ y __eq__ se llaman en cada operación de sets
+        object.__setattr__(self, "username_lower", self.username.lower())
 
     @property
     def profile_url(self) -> str:
-        return f"https://www.instagram.com/{self.username}"
+        return PROFILE_URL_PREFIX + self.username
 
     @property
     def avatar_url(self) -> str:
@@ -47,11 +59,16 @@ class InstagramUser:
         return f"https://api.dicebear.com/7.x/avataaars/svg?seed={self.username}&backgroundColor=b6e3f4,c0aede,d1d4f9,ffd5dc,ffdfbf"
 
     def __hash__(self):
-        return hash(self.username.lower())
+        return hash(self.username_lower)
+
+    def __reduce__(self):
+        # Solo se serializa el username (caché de st.cache_data): los campos
+        # derivados se recalculan con __post_init__ al deserializar
+        return (InstagramUser, (self.username,))
 
     def __eq__(self, other):
         if isinstance(other, InstagramUser):
-            return self.username.lower() == other.username.lower()
+            return self.username_lower == other.username_lower
         return False
 
 
@@ -59,6 +76,14 @@ class InstagramUser:
 # FUNCIONES DE PARSEO
 # =============================================================================
 
+# Primer carácter no blanco esperado en cada export: permite descartar archivos que
+# obviamente no son el JSON correcto sin invocar al parser (re.match no copia el buffer)
+_JSON_ARRAY_START = re.compile(rb"[ \t\n\r]*\[")
+_JSON_OBJECT_START = re.compile(rb"[ \t\n\r]*\{")
+
+# En todos los parsers, las entradas que no son objetos (p. ej. null) se saltean
+
+
 def parse_followers(files: List[bytes]) -> Set[InstagramUser]:
     """
     Parsea uno o más archivos followers_X.json
@@ -72,20 +97,27 @@ def parse_followers(files: List[bytes]) -> Set[InstagramUser]:
       }
     ]
     """
-    users = set()
+    # Se deduplica sobre str y solo se construye un InstagramUser por nombre único
+    names = []
     for content in files:
+        if not _JSON_ARRAY_START.match(content):
+            continue
         try:
-            data = json.loads(content.decode('utf-8'))
+            data = orjson.loads(content)
             if not isinstance(data, list):
                 continue
-            for entry in data:
-                string_list = entry.get("string_list_data", [])
-                for item in string_list:
-                    if value := item.get("value"):
-                        users.add(InstagramUser(value.strip()))
-        except (json.JSONDecodeError, UnicodeDecodeError):
+            # Comprensión de lista: LIST_APPEND en bytecode en lugar de un append por ítem
+            names.extend([
+                value.strip()
+                for entry in data if isinstance(entry, dict)
+                for item in entry.get("string_list_data", ()) if isinstance(item, dict)
+                if (value := item.get("value"))
+            ])
+        except orjson.JSONDecodeError:
             continue
-    return users
+    # dict.fromkeys deduplica en orden de archivo: entre variantes de mayúsculas
+    # gana la primera aparición, sin depender del orden de hash de un set
+    return {InstagramUser(name) for name in dict.fromkeys(names)}
 
 
 def parse_followers_with_timestamps(files: List[bytes]) -> tuple[Set[InstagramUser], Dict[str, int]]:
@@ -95,24 +127,27 @@ def parse_followers_with_timestamps(files: List[bytes]) -> tuple[Set[InstagramUs
     Returns:
         Tuple con set de usuarios y dict de username.lower() -> timestamp
     """
-    users = set()
-    timestamps = {}
+    # Dos listas alineadas (nombre, timestamp o -1 si falta); set y dict se arman al final
+    names = []
+    stamps = []
     for content in files:
+        if not _JSON_ARRAY_START.match(content):
+            continue
         try:
-            data = json.loads(content.decode('utf-8'))
+            data = orjson.loads(content)
             if not isinstance(data, list):
                 continue
             for entry in data:
-                string_list = entry.get("string_list_data", [])
-                for item in string_list:
-                    if value := item.get("value"):
-                        username = value.strip()
-                        users.add(InstagramUser(username))
-                        if ts := item.get("timestamp"):
-                            timestamps[username.lower()] = ts
-        except (json.JSONDecodeError, UnicodeDecodeError):
+                if not isinstance(entry, dict):
+                    continue
+                for item in entry.get("string_list_data", ()):
+                    if isinstance(item, dict) and (value := item.get("value")):
+                        names.append(value.strip())
+                        stamps.append(item.get("timestamp") or -1)
+        except orjson.JSONDecodeError:
             continue
-    return users, timestamps
+    timestamps = {name.lower(): ts for name, ts in zip(names, stamps) if ts != -1}
+    return {InstagramUser(name) for name in dict.fromkeys(names)}, timestamps
 
 
 def parse_following(content: bytes) -> Set[InstagramUser]:
@@ -129,21 +164,23 @@ def parse_following(content: bytes) -> Set[InstagramUser]:
       ]
     }
     """
-    users = set()
+    if not _JSON_OBJECT_START.match(content):
+        return set()
     try:
-        data = json.loads(content.decode('utf-8'))
-        relationships = data.get("relationships_following", [])
-
-        if not isinstance(relationships, list):
-            return users
-
-        for entry in relationships:
-            # El username está en "title"
-            if title := entry.get("title"):
-                users.add(InstagramUser(title.strip()))
-    except (json.JSONDecodeError, UnicodeDecodeError):
-        pass
-    return users
+        # Acceso directo a la clave conocida
+        relationships = orjson.loads(content)["relationships_following"]
+    except (orjson.JSONDecodeError, KeyError):
+        return set()
+    if not isinstance(relationships, list):
+        return set()
+
+    # El username está en "title"
+    names = [
+        title.strip()
+        for entry in relationships
+        if isinstance(entry, dict) and (title := entry.get("title"))
+    ]
+    return {InstagramUser(name) for name in dict.fromkeys(names)}
 
 
 def parse_following_with_timestamps(content: bytes) -> tuple[Set[InstagramUser], Dict[str, int]]:
@@ -155,26 +192,40 @@ def parse_following_with_timestamps(content: bytes) -> tuple[Set[InstagramUser],
     """
     users = set()
     timestamps = {}
+    if not _JSON_OBJECT_START.match(content):
+        return users, timestamps
     try:
-        data = json.loads(content.decode('utf-8'))
-        relationships = data.get("relationships_following", [])
-
-        if not isinstance(relationships, list):
-            return users, timestamps
-
-        for entry in relationships:
-            if title := entry.get("title"):
-                username = title.strip()
-                users.add(InstagramUser(username))
-                # El timestamp está en string_list_data
-                string_list = entry.get("string_list_data", [])
-                if string_list and (ts := string_list[0].get("timestamp")):
-                    timestamps[username.lower()] = ts
-    except (json.JSONDecodeError, UnicodeDecodeError):
-        pass
+        relationships = orjson.loads(content)["relationships_following"]
+    except (orjson.JSONDecodeError, KeyError):
+        return users, timestamps
+    if not isinstance(relationships, list):
+        return users, timestamps
+
+    # Dos listas alineadas; el timestamp está en string_list_data (-1 si falta)
+    names = []
+    stamps = []
+    for entry in relationships:
+        if isinstance(entry, dict) and (title := entry.get("title")):
+            names.append(title.strip())
+            string_list = entry.get("string_list_data")
+            stamps.append((string_list[0].get("timestamp") if string_list else None) or -1)
+    users = {InstagramUser(name) for name in dict.fromkeys(names)}
+    timestamps = {name.lower(): ts for name, ts in zip(names, stamps) if ts != -1}
     return users, timestamps
 
 
+@st.cache_data(max_entries=4, show_spinner=False)
+def cached_parse_followers(files: tuple[bytes, ...]) -> tuple[Set[InstagramUser], Dict[str, int]]:
+    """parse_followers_with_timestamps cacheado por contenido para no reparsear en cada rerun"""
+    return parse_followers_with_timestamps(files)
+
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def cached_parse_following(content: bytes) -> tuple[Set[InstagramUser], Dict[str, int]]:
+    """parse_following_with_timestamps cacheado por contenido para no reparsear en cada rerun"""
+    return parse_following_with_timestamps(content)
+
+
 # =============================================================================
 # FUNCIÓN DE ANÁLISIS
 # =============================================================================
@@ -182,14 +233,53 @@ def parse_following_with_timestamps(content: bytes) -> tuple[Set[InstagramUser],
 def analyze(followers: Set[InstagramUser], following: Set[InstagramUser]) -> Dict[str, Any]:
     """Analiza las relaciones entre seguidores y seguidos"""
     return {
-        "not_following_back": following - followers,  # Personas que sigues pero no te siguen
-        "not_followed_by_me": followers - following,  # Personas que te siguen pero no sigues
-        "mutual": followers & following,              # Seguidores mutuos
+        # frozenset: los grupos son de solo lectura una vez calculados
+        "not_following_back": frozenset(following - followers),  # Personas que sigues pero no te siguen
+        "not_followed_by_me": frozenset(followers - following),  # Personas que te siguen pero no sigues
+        "mutual": frozenset(followers & following),              # Seguidores mutuos
         "total_followers": len(followers),
         "total_following": len(following)
     }
 
 
+def prepare_results(
+    results: Dict[str, Any],
+    followers_ts: Dict[str, int],
+    following_ts: Dict[str, int]
+) -> Dict[str, Any]:
+    """
+    Agrega a los resultados los datos derivados que usa la UI
+
+    Se calcula una sola vez por análisis en lugar de en cada render:
+        mutual_ts: username.lower() -> timestamp más reciente entre ambos lados
+        followers_dates / following_dates / mutual_dates: username.lower() -> "dd/mm/YYYY"
+            (solo para los usuarios de not_followed_by_me / not_following_back / mutual)
+        <grupo>_by_name / <grupo>_by_recency: tuplas de usuarios ya ordenadas
+    """
+    results["mutual_ts"] = {
+        u.username_lower: max(followers_ts.get(u.username_lower, 0), following_ts.get(u.username_lower, 0))
+        for u in results["mutual"]
+    }
+    # Solo se formatean las fechas del grupo que las muestra: los mutuos usan mutual_dates
+    results["followers_dates"] = format_timestamps(followers_ts, results["not_followed_by_me"])
+    results["following_dates"] = format_timestamps(following_ts, results["not_following_back"])
+    results["mutual_dates"] = format_timestamps(results["mutual_ts"], results["mutual"])
+
+    # Cada grupo se ordena una sola vez (por nombre y por fecha más reciente) y se
+    # guarda como tupla; la UI solo elige el orden y filtra
+    for key, ts_dict in (
+        ("not_following_back", following_ts),
+        ("not_followed_by_me", followers_ts),
+        ("mutual", results["mutual_ts"])
+    ):
+        by_name = sorted(results[key], key=attrgetter("username_lower"))
+        results[f"{key}_by_name"] = tuple(by_name)
+        results[f"{key}_by_recency"] = tuple(
+            sorted(by_name, key=lambda u: ts_dict.get(u.username_lower, 0), reverse=True)
+        )
+    return results
+
+
 # =============================================================================
 # GENERADOR DE EXCEL
 # =============================================================================
@@ -197,49 +287,43 @@ def analyze(followers: Set[InstagramUser], following: Set[InstagramUser]) -> Dic
 def generate_excel(results: Dict[str, Any]) -> bytes:
     """Genera Excel con hipervínculos a los perfiles"""
     output = BytesIO()
+    wb = xlsxwriter.Workbook(output, {"in_memory": True, "strings_to_urls": False})
+    # Mismo estilo de encabezado que generaba pd.ExcelWriter
+    header_format = wb.add_format({"bold": True, "border": 1, "align": "center"})
+
+    # Hoja de resumen
+    summary_rows = [
+        ("Total Seguidores", results["total_followers"]),
+        ("Total Seguidos", results["total_following"]),
+        ("No te siguen de vuelta", len(results["not_following_back"])),
+        ("No sigues de vuelta", len(results["not_followed_by_me"])),
+        ("Seguidores mutuos", len(results["mutual"]))
+    ]
+    ws = wb.add_worksheet("Resumen")
+    ws.write_row(0, 0, ("Métrica", "Valor"), header_format)
+    for row, values in enumerate(summary_rows, start=1):
+        ws.write_row(row, 0, values)
+
+    # Hojas de usuarios
+    sheets = [
+        ("No te siguen", results["not_following_back"]),
+        ("No sigues", results["not_followed_by_me"]),
+        ("Mutuos", results["mutual"])
+    ]
 
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        # Hoja de resumen
-        summary_data = {
-            "Métrica": [
-                "Total Seguidores",
-                "Total Seguidos",
-                "No te siguen de vuelta",
-                "No sigues de vuelta",
-                "Seguidores mutuos"
-            ],
-            "Valor": [
-                results["total_followers"],
-                results["total_following"],
-                len(results["not_following_back"]),
-                len(results["not_followed_by_me"]),
-                len(results["mutual"])
-            ]
-        }
-        pd.DataFrame(summary_data).to_excel(writer, sheet_name="Resumen", index=False)
-
-        # Hojas de usuarios
-        sheets = [
-            ("No te siguen", results["not_following_back"]),
-            ("No sigues", results["not_followed_by_me"]),
-            ("Mutuos", results["mutual"])
-        ]
-
-        for sheet_name, users in sheets:
-            if users:
-                df = pd.DataFrame([
-                    {
-                        "Usuario": u.username,
-                        "Perfil": u.profile_url
-                    }
-                    for u in sorted(users, key=lambda x: x.username.lower())
-                ])
-            else:
-                df = pd.DataFrame({"Usuario": [], "Perfil": []})
-
-            df.to_excel(writer, sheet_name=sheet_name[:31], index=False)
-
-    output.seek(0)
+    for sheet_name, users in sheets:
+        ws = wb.add_worksheet(sheet_name[:31])
+        ws.write_row(0, 0, ("Usuario", "Perfil"), header_format)
+        usernames = [u.username for u in sorted(users, key=attrgetter("username_lower"))]
+        # URLs construidas en bloque en vez de una property por fila
+        urls = [PROFILE_URL_PREFIX + name for name in usernames]
+        # write_string directo: evita el despacho por tipo de write()/write_column()
+        write_string = ws.write_string
+        for row, (name, url) in enumerate(zip(usernames, urls), start=1):
+            write_string(row, 0, name)
+            write_string(row, 1, url)
+
+    wb.close()
     return output.getvalue()
 
 
@@ -448,6 +532,20 @@ def load_css():
             border: 1px solid rgba(128, 128, 128, 0.1); /* Borde sutil */
         }
 
+        /* Lista de cards con scroll propio: las cards fuera de pantalla no se
+           maquetan ni pintan (content-visibility) */
+        .user-list {
+            max-height: 720px;
+            overflow-y: auto;
+            overflow-x: hidden;
+            padding-right: 12px;
+        }
+
+        .user-list > a.user-card {
+            content-visibility: auto;
+            contain-intrinsic-size: auto 82px;
+        }
+
         .user-card:hover {
             transform: translateX(8px);
             box-shadow: 0 6px 20px rgba(0,0,0,0.1);
@@ -510,6 +608,16 @@ def load_css():
             color: white !important;
         }
 
+        /* Input de búsqueda: asegura que el icono se vea bien y el texto sea legible */
+        div[data-testid="stTextInput"] input {
+            padding-right: 44px !important;
+            background-repeat: no-repeat;
+            background-position: right 12px center;
+            background-size: 18px 18px;
+            /* Icono SVG */
+            background-image: url("data:image/svg+xml;utf8,<svg xmlns='http://www.w3.org/2000/svg' viewBox='0 0 24 24'><path fill='%23E1306C' d='M2.01 21L23 12 2.01 3 2 10l15 2-15 2z'/></svg>");
+        }
+
         /* Download section */
         .download-card {
             background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
@@ -575,8 +683,8 @@ def render_stepper(current_step: int):
         )
 
     steps_html = "".join(steps_html_parts)
-    html = f'<div class="stepper-container">{steps_html}</div>'
-    st.markdown(html, unsafe_allow_html=True)
+    stepper_html = f'<div class="stepper-container">{steps_html}</div>'
+    st.markdown(stepper_html, unsafe_allow_html=True)
 
 
 def render_tutorial():
@@ -651,30 +759,56 @@ def format_timestamp(ts: Optional[int]) -> str:
         return ""
 
 
-def render_user_cards(users: Set[InstagramUser], category: str, color_class: str):
-    """Renderiza las cards de usuarios con avatar y link"""
-    if not users:
+def format_timestamps(timestamps: Dict[str, int], users: FrozenSet[InstagramUser]) -> Dict[str, str]:
+    """Formatea los timestamps de los usuarios dados, omitiendo los vacíos o inválidos"""
+    return {
+        u.username_lower: date_str
+        for u in users
+        if (date_str := format_timestamp(timestamps.get(u.username_lower)))
+    }
+
+
+# Plantilla de card en una sola línea: sin líneas en blanco que corten el bloque
+# HTML en markdown. Los valores se escapan con html.escape antes de formatear.
+USER_CARD_HTML = (
+    '<a href="{url}" target="_blank" class="user-card">'
+    '<img src="{avatar}" class="user-avatar {color}" alt="{name}">'
+    '<div class="user-info">'
+    '<p class="user-name">{name}</p>'
+    '<p class="user-handle">@{name}</p>'
+    '{date_html}'
+    '</div>'
+    '<span class="user-action">Ver perfil →</span>'
+    '</a>'
+)
+
+
+def _show_more(items_key: str):
+    """Callback de "Ver más": muestra 50 cards adicionales"""
+    st.session_state[items_key] += 50
+
+
+@st.fragment
+def render_user_cards(users_key: str, category: str, color_class: str):
+    """Renderiza las cards de usuarios con avatar y link
+
+    Es un fragmento: búsqueda, orden y "Ver más" solo re-ejecutan esta función,
+    no el script completo.
+    """
+    results = st.session_state.results
+    if not results[users_key]:
         st.info("No hay usuarios en esta categoría")
         return
 
-    # Obtener timestamps según la categoría
-    followers_ts = st.session_state.get("followers_timestamps", {})
-    following_ts = st.session_state.get("following_timestamps", {})
-
-    # Determinar qué timestamps usar para mostrar fecha en cards
+    # Determinar qué fechas mostrar en cards (precalculadas al analizar)
     if category == "ghosts":  # No te siguen → mostrar cuándo los seguiste
-        display_ts = following_ts
+        display_dates = results["following_dates"]
         date_label = "Seguido el"
     elif category == "fans":  # No sigues → mostrar cuándo te siguieron
-        display_ts = followers_ts
+        display_dates = results["followers_dates"]
         date_label = "Te sigue desde"
     else:  # Mutuos → mostrar el más reciente
-        display_ts = {}
-        for u in users:
-            key = u.username.lower()
-            ts1 = followers_ts.get(key, 0)
-            ts2 = following_ts.get(key, 0)
-            display_ts[key] = max(ts1, ts2)
+        display_dates = results["mutual_dates"]
         date_label = "Desde"
 
     # Opciones de orden
@@ -698,20 +832,6 @@ def render_user_cards(users: Set[InstagramUser], category: str, color_class: str
                 label_visibility="collapsed"
             )
 
-            st.markdown('''
-                <style>
-                    /* Asegura que el icono se vea bien y el texto sea legible */
-                    div[data-testid="stTextInput"] input {
-                        padding-right: 44px !important;
-                        background-repeat: no-repeat;
-                        background-position: right 12px center;
-                        background-size: 18px 18px;
-                        /* Icono SVG */
-                        background-image: url("data:image/svg+xml;utf8,<svg xmlns='http://www.w3.org/2000/svg' viewBox='0 0 24 24'><path fill='%23E1306C' d='M2.01 21L23 12 2.01 3 2 10l15 2-15 2z'/></svg>");
-                    }
-                </style>
-            ''', unsafe_allow_html=True)
-
     with sort_col:
         sort_by = st.selectbox(
             "Ordenar",
@@ -720,18 +840,16 @@ def render_user_cards(users: Set[InstagramUser], category: str, color_class: str
             label_visibility="collapsed"
         )
 
-    # Convertir a lista para ordenar
-    user_list = list(users)
-
-    # Aplicar ordenación
+    # Aplicar ordenación (las tuplas vienen ordenadas desde prepare_results)
     if sort_by == "🔤 Nombre (A-Z)":
-        user_list.sort(key=lambda u: u.username.lower())
+        user_list = results[f"{users_key}_by_name"]
     else:  # Más reciente (por timestamp)
-        user_list.sort(key=lambda u: display_ts.get(u.username.lower(), 0), reverse=True)
+        user_list = results[f"{users_key}_by_recency"]
 
     # Filtrar por búsqueda
     if search:
-        user_list = [u for u in user_list if search.lower() in u.username.lower()]
+        search_key = search.casefold()
+        user_list = [u for u in user_list if search_key in u.username_lower]
 
     total_users = len(user_list)
 
@@ -746,36 +864,124 @@ def render_user_cards(users: Set[InstagramUser], category: str, color_class: str
     # Contador
     st.caption(f"Mostrando {len(visible_users)} de {total_users} usuarios")
 
-    # Renderizar cards
+    # Renderizar cards: se arma un único bloque HTML y se envía en un solo st.markdown
+    parts = []
     for user in visible_users:
-        ts = display_ts.get(user.username.lower())
-        date_str = format_timestamp(ts)
+        date_str = display_dates.get(user.username_lower)
         date_html = f'<span class="user-date">{date_label} {date_str}</span>' if date_str else ''
 
-        st.markdown(f'''
-        <a href="{user.profile_url}" target="_blank" class="user-card">
-            <img src="{user.avatar_url}" class="user-avatar {color_class}" alt="{user.username}">
-            <div class="user-info">
-                <p class="user-name">{user.username}</p>
-                <p class="user-handle">@{user.username}</p>
-                {date_html}
-            </div>
-            <span class="user-action">Ver perfil →</span>
-        </a>
-        ''', unsafe_allow_html=True)
+        parts.append(USER_CARD_HTML.format(
+            url=html.escape(user.profile_url),
+            avatar=html.escape(user.avatar_url),
+            name=html.escape(user.username),
+            color=color_class,
+            date_html=date_html
+        ))
+
+    st.markdown('<div class="user-list">' + "\n".join(parts) + '</div>', unsafe_allow_html=True)
 
     # Botón "Ver más" si hay más usuarios
     if items_to_show < total_users:
         remaining = total_users - items_to_show
         col1, col2, col3 = st.columns([1, 2, 1])
         with col2:
-            if st.button(
+            # El callback corre antes del rerun del fragmento: no hace falta st.rerun()
+            st.button(
                 f"👇 Ver más ({remaining} restantes)",
                 key=f"load_more_{category}",
+                on_click=_show_more,
+                args=(items_key,),
                 width='stretch'
-            ):
-                st.session_state[items_key] += 50
-                st.rerun()
+            )
+
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def _build_donut(mutual: int, not_following_back: int, not_followed_by_me: int, total_following: int) -> go.Figure:
+    """Donut de distribución de relaciones (cacheado: solo depende de los conteos)"""
+    fig_donut = go.Figure(data=[go.Pie(
+        labels=['Mutuos', 'No te siguen', 'No sigues'],
+        values=[mutual, not_following_back, not_followed_by_me],
+        hole=0.6,
+        marker_colors=['#4CAF50', '#FF5722', '#2196F3'],
+        textinfo='label+percent',
+        textposition='outside',
+        pull=[0.03, 0.03, 0]
+    )])
+
+    fig_donut.update_layout(
+        title={'text': '🎯 Distribución de Relaciones', 'font': {'size': 16}},
+        showlegend=True,
+        legend=dict(orientation="h", yanchor="bottom", y=-0.2, xanchor="center", x=0.5),
+        annotations=[dict(
+            text=f'{total_following}<br><b>Seguidos</b>',
+            x=0.5, y=0.5,
+            font_size=14,
+            showarrow=False
+        )],
+        height=380,
+        margin=dict(t=60, b=60, l=20, r=20)
+    )
+
+    return fig_donut
+
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def _build_bar(total_followers: int, total_following: int, mutual: int,
+               not_following_back: int, not_followed_by_me: int) -> go.Figure:
+    """Barras con el resumen de métricas (cacheado: solo depende de los conteos)"""
+    fig_bar = go.Figure()
+
+    categories = ['Seguidores', 'Seguidos', 'Mutuos', 'No te siguen', 'No sigues']
+    values = [total_followers, total_following, mutual, not_following_back, not_followed_by_me]
+    colors = ['#E1306C', '#833AB4', '#4CAF50', '#FF5722', '#2196F3']
+
+    fig_bar.add_trace(go.Bar(
+        x=categories,
+        y=values,
+        marker_color=colors,
+        text=values,
+        textposition='outside'
+    ))
+
+    fig_bar.update_layout(
+        title={'text': '📊 Resumen de Métricas', 'font': {'size': 16}},
+        xaxis_title="",
+        yaxis_title="Cantidad",
+        showlegend=False,
+        height=380,
+        margin=dict(t=60, b=40, l=40, r=20)
+    )
+
+    return fig_bar
+
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def _build_gauge(health_score: int) -> go.Figure:
+    """Gauge de puntuación de salud (cacheado por puntuación)"""
+    fig_gauge = go.Figure(go.Indicator(
+        mode="gauge+number",
+        value=health_score,
+        domain={'x': [0, 1], 'y': [0, 1]},
+        title={'text': "🏆 Puntuación de Salud", 'font': {'size': 18}},
+        gauge={
+            'axis': {'range': [0, 100], 'tickwidth': 1},
+            'bar': {'color': "#E1306C"},
+            'steps': [
+                {'range': [0, 40], 'color': "#ffebee"},
+                {'range': [40, 70], 'color': "#fff3e0"},
+                {'range': [70, 100], 'color': "#e8f5e9"}
+            ],
+            'threshold': {
+                'line': {'color': "#4CAF50", 'width': 4},
+                'thickness': 0.75,
+                'value': 70
+            }
+        }
+    ))
+
+    fig_gauge.update_layout(height=280, margin=dict(t=80, b=20))
+
+    return fig_gauge
 
 
 def render_charts(results: Dict[str, Any]):
@@ -832,57 +1038,12 @@ def render_charts(results: Dict[str, Any]):
 
     with chart_col1:
         # Donut Chart
-        fig_donut = go.Figure(data=[go.Pie(
-            labels=['Mutuos', 'No te siguen', 'No sigues'],
-            values=[mutual, not_following_back, not_followed_by_me],
-            hole=0.6,
-            marker_colors=['#4CAF50', '#FF5722', '#2196F3'],
-            textinfo='label+percent',
-            textposition='outside',
-            pull=[0.03, 0.03, 0]
-        )])
-
-        fig_donut.update_layout(
-            title={'text': '🎯 Distribución de Relaciones', 'font': {'size': 16}},
-            showlegend=True,
-            legend=dict(orientation="h", yanchor="bottom", y=-0.2, xanchor="center", x=0.5),
-            annotations=[dict(
-                text=f'{total_following}<br><b>Seguidos</b>',
-                x=0.5, y=0.5,
-                font_size=14,
-                showarrow=False
-            )],
-            height=380,
-            margin=dict(t=60, b=60, l=20, r=20)
-        )
-
+        fig_donut = _build_donut(mutual, not_following_back, not_followed_by_me, total_following)
         st.plotly_chart(fig_donut, width='stretch')
 
     with chart_col2:
         # Bar Chart
-        fig_bar = go.Figure()
-
-        categories = ['Seguidores', 'Seguidos', 'Mutuos', 'No te siguen', 'No sigues']
-        values = [total_followers, total_following, mutual, not_following_back, not_followed_by_me]
-        colors = ['#E1306C', '#833AB4', '#4CAF50', '#FF5722', '#2196F3']
-
-        fig_bar.add_trace(go.Bar(
-            x=categories,
-            y=values,
-            marker_color=colors,
-            text=values,
-            textposition='outside'
-        ))
-
-        fig_bar.update_layout(
-            title={'text': '📊 Resumen de Métricas', 'font': {'size': 16}},
-            xaxis_title="",
-            yaxis_title="Cantidad",
-            showlegend=False,
-            height=380,
-            margin=dict(t=60, b=40, l=40, r=20)
-        )
-
+        fig_bar = _build_bar(total_followers, total_following, mutual, not_following_back, not_followed_by_me)
         st.plotly_chart(fig_bar, width='stretch')
 
     # Gauge de salud
@@ -892,28 +1053,7 @@ def render_charts(results: Dict[str, Any]):
         max(0, (100 - ghost_rate)) * 0.2
     ))
 
-    fig_gauge = go.Figure(go.Indicator(
-        mode="gauge+number",
-        value=health_score,
-        domain={'x': [0, 1], 'y': [0, 1]},
-        title={'text': "🏆 Puntuación de Salud", 'font': {'size': 18}},
-        gauge={
-            'axis': {'range': [0, 100], 'tickwidth': 1},
-            'bar': {'color': "#E1306C"},
-            'steps': [
-                {'range': [0, 40], 'color': "#ffebee"},
-                {'range': [40, 70], 'color': "#fff3e0"},
-                {'range': [70, 100], 'color': "#e8f5e9"}
-            ],
-            'threshold': {
-                'line': {'color': "#4CAF50", 'width': 4},
-                'thickness': 0.75,
-                'value': 70
-            }
-        }
-    ))
-
-    fig_gauge.update_layout(height=280, margin=dict(t=80, b=20))
+    fig_gauge = _build_gauge(health_score)
     st.plotly_chart(fig_gauge, width='stretch')
 
 
@@ -924,23 +1064,33 @@ def render_table_view(results: Dict[str, Any]):
     followers_ts = st.session_state.get("followers_timestamps", {})
     following_ts = st.session_state.get("following_timestamps", {})
 
-    def create_df(users: Set[InstagramUser], ts_dict: Dict[str, int], date_col_name: str) -> pd.DataFrame:
+    def create_df(users: FrozenSet[InstagramUser], ts_dict: Dict[str, int], dates: Dict[str, str]) -> pd.DataFrame:
         if not users:
             return pd.DataFrame({"Usuario": [], "Fecha": [], "Perfil": []})
 
-        data = []
-        for u in users:
-            ts = ts_dict.get(u.username.lower())
-            date_str = format_timestamp(ts) if ts else "-"
-            data.append({
-                "Usuario": f"@{u.username}",
-                "Fecha": date_str,
-                "Perfil": u.profile_url
-            })
+        # Columnas construidas en bloque (dict de listas) en vez de un dict por fila
+        usernames = [u.username for u in users]
+        ts_list = [ts_dict.get(u.username_lower, 0) for u in users]
+        df = pd.DataFrame({
+            "Usuario": ["@" + name for name in usernames],
+            "Fecha": [dates.get(u.username_lower, "-") for u in users],
+            "Perfil": [PROFILE_URL_PREFIX + name for name in usernames],
+            "_ts": ts_list
+        })
 
         # Ordenar por timestamp descendente (más reciente primero)
-        data.sort(key=lambda x: ts_dict.get(x["Usuario"][1:].lower(), 0), reverse=True)
-        return pd.DataFrame(data)
+        df.sort_values("_ts", ascending=False, kind="stable", inplace=True, ignore_index=True)
+        df.drop(columns="_ts", inplace=True)
+        return df
+
+    # Las tres pestañas se ejecutan en cada rerun aunque no estén visibles: los
+    # DataFrames se guardan en los resultados y solo se construyen una vez por análisis
+    tables = results.setdefault("tables", {})
+
+    def get_df(category: str, users: FrozenSet[InstagramUser], ts_dict: Dict[str, int], dates: Dict[str, str]) -> pd.DataFrame:
+        if category not in tables:
+            tables[category] = create_df(users, ts_dict, dates)
+        return tables[category]
 
     tab1, tab2, tab3 = st.tabs([
         f"❌ No te siguen ({len(results['not_following_back'])})",
@@ -949,7 +1099,7 @@ def render_table_view(results: Dict[str, Any]):
     ])
 
     with tab1:
-        df = create_df(results["not_following_back"], following_ts, "Seguido el")
+        df = get_df("ghosts", results["not_following_back"], following_ts, results["following_dates"])
         st.dataframe(
             df,
             column_config={
@@ -963,7 +1113,7 @@ def render_table_view(results: Dict[str, Any]):
         )
 
     with tab2:
-        df = create_df(results["not_followed_by_me"], followers_ts, "Te sigue desde")
+        df = get_df("fans", results["not_followed_by_me"], followers_ts, results["followers_dates"])
         st.dataframe(
             df,
             column_config={
@@ -977,15 +1127,8 @@ def render_table_view(results: Dict[str, Any]):
         )
 
     with tab3:
-        # Para mutuos, usar el timestamp más reciente
-        mutual_ts = {}
-        for u in results["mutual"]:
-            key = u.username.lower()
-            ts1 = followers_ts.get(key, 0)
-            ts2 = following_ts.get(key, 0)
-            mutual_ts[key] = max(ts1, ts2)
-
-        df = create_df(results["mutual"], mutual_ts, "Desde")
+        # Para mutuos, usar el timestamp más reciente (precalculado al analizar)
+        df = get_df("mutuals", results["mutual"], results["mutual_ts"], results["mutual_dates"])
         st.dataframe(
             df,
             column_config={
@@ -1021,8 +1164,7 @@ def render_users_section(results: Dict[str, Any]):
 
     with header_col3:
         if st.button("🔄 Nuevo análisis", width='stretch'):
-            for key in list(st.session_state.keys()):
-                del st.session_state[key]
+            reset_analysis_state()
             st.rerun()
 
     # Selector de vista
@@ -1042,15 +1184,15 @@ def render_users_section(results: Dict[str, Any]):
 
         with tabs[0]:
             st.markdown("**Personas que sigues pero no te siguen de vuelta** - *considera dejar de seguirlas*")
-            render_user_cards(results["not_following_back"], "ghosts", "avatar-ghost")
+            render_user_cards("not_following_back", "ghosts", "avatar-ghost")
 
         with tabs[1]:
             st.markdown("**Personas que te siguen pero no sigues** - *considera seguirlas*")
-            render_user_cards(results["not_followed_by_me"], "fans", "avatar-fan")
+            render_user_cards("not_followed_by_me", "fans", "avatar-fan")
 
         with tabs[2]:
             st.markdown("**Seguidores mutuos** - *relación recíproca*")
-            render_user_cards(results["mutual"], "mutuals", "avatar-mutual")
+            render_user_cards("mutual", "mutuals", "avatar-mutual")
     else:
         render_table_view(results)
 
@@ -1087,6 +1229,24 @@ def init_state():
             st.session_state[key] = val
 
 
+# Claves ligadas a un análisis concreto (datos, uploads y estado del explorador)
+ANALYSIS_KEYS = (
+    "followers", "following", "results",
+    "followers_timestamps", "following_timestamps",
+    "followers_upload", "following_upload",
+    "followers_upload_id", "following_upload_id",
+)
+ANALYSIS_KEY_PREFIXES = ("items_shown_", "sort_", "search_")
+
+
+def reset_analysis_state():
+    """Borra solo el estado del análisis actual; el resto de la sesión se conserva"""
+    for key in ANALYSIS_KEYS:
+        st.session_state.pop(key, None)
+    for key in [k for k in st.session_state.keys() if k.startswith(ANALYSIS_KEY_PREFIXES)]:
+        del st.session_state[key]
+
+
 # =============================================================================
 # FUNCIÓN PRINCIPAL
 # =============================================================================
@@ -1158,12 +1318,18 @@ def main():
 
             if followers_files:
                 try:
-                    contents = [f.read() for f in followers_files]
-                    users, timestamps = parse_followers_with_timestamps(contents)
-                    if users:
-                        st.session_state.followers = users
-                        st.session_state.followers_timestamps = timestamps
-                        st.success(f"✅ {len(users)} seguidores cargados")
+                    # file_id cambia con cada subida: si coincide, el parseo ya está en sesión
+                    upload_id = tuple(f.file_id for f in followers_files)
+                    if st.session_state.get("followers_upload_id") != upload_id:
+                        contents = tuple(f.getvalue() for f in followers_files)
+                        users, timestamps = cached_parse_followers(contents)
+                        if users:
+                            st.session_state.followers = users
+                            st.session_state.followers_timestamps = timestamps
+                            st.session_state.followers_upload_id = upload_id
+
+                    if st.session_state.get("followers_upload_id") == upload_id:
+                        st.success(f"✅ {len(st.session_state.followers)} seguidores cargados")
                     else:
                         st.warning("⚠️ No se encontraron usuarios en los archivos")
                 except Exception as e:
@@ -1182,11 +1348,16 @@ def main():
 
             if following_file:
                 try:
-                    users, timestamps = parse_following_with_timestamps(following_file.read())
-                    if users:
-                        st.session_state.following = users
-                        st.session_state.following_timestamps = timestamps
-                        st.success(f"✅ {len(users)} seguidos cargados")
+                    upload_id = following_file.file_id
+                    if st.session_state.get("following_upload_id") != upload_id:
+                        users, timestamps = cached_parse_following(following_file.getvalue())
+                        if users:
+                            st.session_state.following = users
+                            st.session_state.following_timestamps = timestamps
+                            st.session_state.following_upload_id = upload_id
+
+                    if st.session_state.get("following_upload_id") == upload_id:
+                        st.success(f"✅ {len(st.session_state.following)} seguidos cargados")
                     else:
                         st.warning("⚠️ No se encontraron usuarios en el archivo")
                 except Exception as e:
@@ -1204,6 +1375,11 @@ def main():
                             st.session_state.followers,
                             st.session_state.following
                         )
+                        results = prepare_results(
+                            results,
+                            st.session_state.followers_timestamps,
+                            st.session_state.following_timestamps
+                        )
                         st.session_state.results = results
                         st.rerun()
 
@@ -4,6 +4,11 @@ Tests para Instagram Followers Analyzer
 
 import pytest
 import json
+import pickle
+import zipfile
+import xml.etree.ElementTree as ET
+from io import BytesIO
+from datetime import datetime
 from app import (
     InstagramUser,
     parse_followers,
@@ -11,6 +16,7 @@ from app import (
     parse_followers_with_timestamps,
     parse_following_with_timestamps,
     analyze,
+    prepare_results,
     generate_excel
 )
 
@@ -142,6 +148,21 @@ class TestInstagramUser:
 
         assert hash(user1) == hash(user2)
 
+    def test_username_lower_precomputed(self):
+        """Verifica que se guarda el username en minúsculas"""
+        user = InstagramUser("TestUser")
+        assert user.username == "TestUser"
+        assert user.username_lower == "testuser"
+
+    def test_pickle_roundtrip_rebuilds_instance(self):
+        """Al deserializar se reconstruye con el constructor (campos derivados)"""
+        user = pickle.loads(pickle.dumps(InstagramUser("TestUser")))
+
+        assert user == InstagramUser("testuser")
+        assert user in {InstagramUser("testuser")}
+        assert user.username == "TestUser"
+        assert hash(user) == hash("testuser")
+
     def test_set_deduplication(self):
         """Verifica que usuarios duplicados se eliminan en sets"""
         users = {
@@ -198,6 +219,25 @@ class TestParseFollowers:
         users = parse_followers([])
         assert len(users) == 0
 
+    def test_case_duplicates_keep_first_occurrence(self):
+        """Entre variantes de mayúsculas se conserva la primera en orden de archivo"""
+        content = json.dumps([
+            {"string_list_data": [{"value": f"User{i}"}]} for i in range(50)
+        ] + [
+            {"string_list_data": [{"value": f"user{i}"}]} for i in range(50)
+        ]).encode('utf-8')
+        users = parse_followers([content])
+
+        assert len(users) == 50
+        assert all(u.username.startswith("User") for u in users)
+
+    def test_null_entries_are_skipped(self):
+        """Entradas null no descartan el resto del archivo"""
+        content = b'[null, {"string_list_data": [null, {"value": "user1"}]}]'
+        users = parse_followers([content])
+
+        assert users == {InstagramUser("user1")}
+
 
 # =============================================================================
 # TESTS: Parser de Following
@@ -224,6 +264,23 @@ class TestParseFollowing:
         users = parse_following(malformed_json)
         assert len(users) == 0
 
+    def test_parse_followers_file_returns_empty_set(self, valid_followers_json):
+        """Retorna set vacío si se sube un followers_X.json (raíz lista)"""
+        users = parse_following(valid_followers_json)
+        assert len(users) == 0
+
+    def test_parse_unexpected_shape_returns_empty_set(self):
+        """Retorna set vacío si falta la clave o no contiene una lista"""
+        assert parse_following(b'{"other_key": []}') == set()
+        assert parse_following(b'{"relationships_following": "user1"}') == set()
+
+    def test_null_entries_are_skipped(self):
+        """Entradas null no descartan el resto del archivo"""
+        content = b'{"relationships_following": [null, {"title": "user1"}]}'
+
+        assert parse_following(content) == {InstagramUser("user1")}
+        assert parse_following_with_timestamps(content)[0] == {InstagramUser("user1")}
+
 
 # =============================================================================
 # TESTS: Analyze
@@ -274,6 +331,24 @@ class TestAnalyze:
         assert results["total_followers"] == 0
         assert results["total_following"] == 0
 
+    def test_groups_are_immutable(self, sample_followers, sample_following):
+        """Los grupos del análisis se devuelven como frozenset"""
+        results = analyze(sample_followers, sample_following)
+
+        for key in ("not_following_back", "not_followed_by_me", "mutual"):
+            assert isinstance(results[key], frozenset)
+
+    def test_following_larger_than_followers(self):
+        """Clasifica igual cuando el lado de following es el más grande"""
+        followers = {InstagramUser("a")}
+        following = {InstagramUser("a"), InstagramUser("b"), InstagramUser("c")}
+
+        results = analyze(followers, following)
+
+        assert results["mutual"] == {InstagramUser("a")}
+        assert results["not_following_back"] == {InstagramUser("b"), InstagramUser("c")}
+        assert len(results["not_followed_by_me"]) == 0
+
     def test_all_mutual(self):
         """Cuando todos son mutuos"""
         followers = {InstagramUser("a"), InstagramUser("b")}
@@ -297,6 +372,59 @@ class TestAnalyze:
         assert len(results["not_followed_by_me"]) == 2
 
 
+# =============================================================================
+# TESTS: Prepare Results
+# =============================================================================
+
+class TestPrepareResults:
+    """Tests para prepare_results"""
+
+    def test_mutual_ts_uses_most_recent(self, sample_followers, sample_following):
+        """Para mutuos usa el timestamp más reciente entre ambos lados"""
+        results = analyze(sample_followers, sample_following)
+        results = prepare_results(results, {"user2": 100}, {"user2": 200})
+
+        assert results["mutual_ts"] == {"user2": 200}
+
+    def test_mutual_ts_without_timestamps(self, sample_followers, sample_following):
+        """Sin timestamps el valor es 0"""
+        results = analyze(sample_followers, sample_following)
+        results = prepare_results(results, {}, {})
+
+        assert results["mutual_ts"] == {"user2": 0}
+
+    def test_dates_are_preformatted(self, sample_followers, sample_following):
+        """Precalcula las fechas legibles y omite los timestamps vacíos"""
+        ts = int(datetime(2024, 3, 15, 12).timestamp())
+        results = analyze(sample_followers, sample_following)
+        results = prepare_results(results, {"user1": ts, "user3": 0}, {"user2": ts, "user4": ts})
+
+        assert results["followers_dates"] == {"user1": "15/03/2024"}
+        assert results["following_dates"] == {"user4": "15/03/2024"}
+        assert results["mutual_dates"] == {"user2": "15/03/2024"}
+
+    def test_mutual_keys_absent_from_side_dates(self, sample_followers, sample_following):
+        """Los mutuos solo se formatean en mutual_dates"""
+        ts = int(datetime(2024, 3, 15, 12).timestamp())
+        results = analyze(sample_followers, sample_following)
+        results = prepare_results(results, {"user1": ts, "user2": ts}, {"user2": ts, "user4": ts})
+
+        assert "user2" not in results["followers_dates"]
+        assert "user2" not in results["following_dates"]
+        assert "user2" in results["mutual_dates"]
+
+    def test_groups_are_presorted(self, sample_followers, sample_following):
+        """Cada grupo queda ordenado por nombre y por fecha más reciente"""
+        results = analyze(sample_followers, sample_following)
+        results = prepare_results(results, {"user1": 100, "user3": 300}, {})
+
+        by_name = [u.username for u in results["not_followed_by_me_by_name"]]
+        by_recency = [u.username for u in results["not_followed_by_me_by_recency"]]
+
+        assert by_name == ["user1", "user3"]
+        assert by_recency == ["user3", "user1"]
+
+
 # =============================================================================
 # TESTS: Excel Export
 # =============================================================================
@@ -304,6 +432,65 @@ class TestAnalyze:
 class TestGenerateExcel:
     """Tests para generate_excel"""
 
+    @staticmethod
+    def _read_sheets(excel_data: bytes) -> dict:
+        """Lee el xlsx con zipfile: nombre de hoja -> filas con los valores de cada celda"""
+        ns = {"m": "http://schemas.openxmlformats.org/spreadsheetml/2006/main"}
+        with zipfile.ZipFile(BytesIO(excel_data)) as zf:
+            shared = [
+                si.findtext("m:t", namespaces=ns)
+                for si in ET.fromstring(zf.read("xl/sharedStrings.xml")).findall("m:si", ns)
+            ]
+            sheet_names = [
+                sheet.get("name")
+                for sheet in ET.fromstring(zf.read("xl/workbook.xml")).find("m:sheets", ns)
+            ]
+            sheets = {}
+            for index, name in enumerate(sheet_names, start=1):
+                root = ET.fromstring(zf.read(f"xl/worksheets/sheet{index}.xml"))
+                rows = []
+                for row in root.find("m:sheetData", ns).findall("m:row", ns):
+                    values = []
+                    for cell in row.findall("m:c", ns):
+                        value = cell.findtext("m:v", namespaces=ns)
+                        values.append(shared[int(value)] if cell.get("t") == "s" else int(value))
+                    rows.append(values)
+                sheets[name] = rows
+        return sheets
+
+    def test_excel_contents(self):
+        """Verifica hojas, encabezados, orden, URLs y resumen del Excel"""
+        followers = {InstagramUser("alice"), InstagramUser("Bob"), InstagramUser("anna")}
+        following = {InstagramUser("alice"), InstagramUser("zed"), InstagramUser("Carl")}
+        results = analyze(followers, following)
+
+        sheets = self._read_sheets(generate_excel(results))
+
+        assert list(sheets) == ["Resumen", "No te siguen", "No sigues", "Mutuos"]
+        assert sheets["Resumen"] == [
+            ["Métrica", "Valor"],
+            ["Total Seguidores", 3],
+            ["Total Seguidos", 3],
+            ["No te siguen de vuelta", 2],
+            ["No sigues de vuelta", 2],
+            ["Seguidores mutuos", 1],
+        ]
+        # Orden alfabético sin distinguir mayúsculas
+        assert sheets["No te siguen"] == [
+            ["Usuario", "Perfil"],
+            ["Carl", "https://www.instagram.com/Carl"],
+            ["zed", "https://www.instagram.com/zed"],
+        ]
+        assert sheets["No sigues"] == [
+            ["Usuario", "Perfil"],
+            ["anna", "https://www.instagram.com/anna"],
+            ["Bob", "https://www.instagram.com/Bob"],
+        ]
+        assert sheets["Mutuos"] == [
+            ["Usuario", "Perfil"],
+            ["alice", "https://www.instagram.com/alice"],
+        ]
+
     def test_returns_bytes(self, sample_followers, sample_following):
         """Verifica que retorna bytes"""
         results = analyze(sample_followers, sample_following)